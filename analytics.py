@@ -0,0 +1,130 @@
+"""Admin analytics served from an in-memory columnar snapshot.
+
+The snapshot is built from db.get_registration_facts(), archived history
+included (one query, one row per registration), into NumPy arrays, with
+event_type/location/organizer_id dictionary-encoded as integer codes. Filters
+and group-bys are vectorized over those arrays, so slicing in the admin tab
+never touches MySQL. The snapshot is shared by all sessions in a worker and
+refreshed in the background once it is older than ANALYTICS_REFRESH_SECONDS.
+"""
+import threading
+import time
+
+import numpy as np
+
+from db import _env, get_registration_facts
+
+DIMENSIONS = ('event_type', 'location', 'organizer_id')
+
+
+class Snapshot:
+    def __init__(self, rows):
+        self.built_at = time.time()
+        (event_id, event_type, location, organizer_id, event_date,
+         is_active, registered, revenue) = zip(*rows) if rows else ((),) * 8
+
+        self.size = len(event_id)
+        self.event_id = np.array(event_id, dtype=np.int64)
+        self.event_date = np.array(event_date, dtype='datetime64[D]')
+        self.is_active = np.array(is_active, dtype=bool)
+        self.registered = np.array(registered, dtype=np.int64)
+        self.revenue = np.array([float(v) for v in revenue], dtype=np.float64)
+
+        # first row of every event, used to count distinct events per group
+        self.first_row = np.zeros(self.size, dtype=bool)
+        self.first_row[np.unique(self.event_id, return_index=True)[1]] = True
+
+        self.labels = {}
+        self.codes = {}
+        for dim, values in zip(DIMENSIONS, (event_type, location, organizer_id)):
+            labels, codes = np.unique(
+                np.array(['N/A' if v is None else str(v) for v in values], dtype=str),
+                return_inverse=True)
+            self.labels[dim] = labels
+            self.codes[dim] = codes.reshape(-1)
+
+    def mask(self, filters=None, start=None, end=None, include_inactive=True):
+        """Boolean row mask. filters maps a dimension to the labels to keep."""
+        mask = np.ones(self.size, dtype=bool)
+        for dim, wanted in (filters or {}).items():
+            if wanted:
+                wanted_codes = np.flatnonzero(np.isin(self.labels[dim], list(wanted)))
+                mask &= np.isin(self.codes[dim], wanted_codes)
+        if start is not None:
+            mask &= self.event_date >= np.datetime64(start, 'D')
+        if end is not None:
+            mask &= self.event_date <= np.datetime64(end, 'D')
+        if not include_inactive:
+            mask &= self.is_active
+        return mask
+
+    def group_by(self, dim, mask=None):
+        """Events, registrations and revenue per value of dim, largest revenue first."""
+        if mask is None:
+            mask = np.ones(self.size, dtype=bool)
+        codes = self.codes[dim]
+        n = len(self.labels[dim])
+        events = np.bincount(codes[mask & self.first_row], minlength=n)
+        registrations = np.bincount(codes[mask], weights=self.registered[mask], minlength=n).astype(np.int64)
+        revenue = np.bincount(codes[mask], weights=self.revenue[mask], minlength=n)
+
+        keep = np.flatnonzero(events)
+        order = keep[np.argsort(-revenue[keep], kind='stable')]
+        return {
+            dim: self.labels[dim][order],
+            'events': events[order],
+            'registrations': registrations[order],
+            'revenue': np.round(revenue[order], 2),
+        }
+
+    def totals(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.size, dtype=bool)
+        return {
+            'events': int(np.count_nonzero(mask & self.first_row)),
+            'registrations': int(self.registered[mask].sum()),
+            'revenue': float(self.revenue[mask].sum()),
+        }
+
+
+_snapshot = None
+_lock = threading.Lock()
+_refreshing = False
+
+
+def refresh():
+    """Rebuild the snapshot from MySQL now and return it."""
+    global _snapshot
+    snapshot = Snapshot(get_registration_facts(include_archived=True))
+    _snapshot = snapshot
+    return snapshot
+
+
+def _refresh_in_background():
+    global _refreshing
+    try:
+        refresh()
+    except Exception as e:
+        print(f"Analytics snapshot refresh failed: {e}")
+    finally:
+        _refreshing = False
+
+
+def get_snapshot(max_age=None):
+    """Return the current snapshot, building it on first use.
+
+    A stale snapshot is still served while a background thread rebuilds it.
+    """
+    global _refreshing
+    if _snapshot is None:
+        with _lock:
+            if _snapshot is None:
+                return refresh()
+    if max_age is None:
+        max_age = int(_env("ANALYTICS_REFRESH_SECONDS", "300"))
+    if time.time() - _snapshot.built_at > max_age:
+        with _lock:
+            if not _refreshing:
+                _refreshing = True
+                threading.Thread(target=_refresh_in_background, daemon=True).start()
+    return _snapshot
@@ -1,11 +1,9 @@
 import time
 import streamlit as st
 import datetime
-from datetime import timedelta
-from db import init_db, authenticate_user, create_user, list_events, add_event, register_user_for_event, record_payment, event_stats, get_saved_cards,decrypt_data,add_saved_card, delete_event,get_user_registrations
-
-# Initialize DB (creates DB and tables if missing). Make sure environment variables are set if not using defaults.
-init_db()
+import html
+import query_budget
+from db import init_db, authenticate_user, create_user, list_events, add_event, register_user_for_event, record_payment, all_event_stats, RegistrationStatusCache, RegistrationPending, get_saved_cards,decrypt_data,add_saved_card, delete_event,get_user_registrations
 
 # st.markdown("""
 #     <style>
@@ -18,6 +16,17 @@ init_db()
 
 
 st.set_page_config(page_title="Events Portal", layout="centered")
+
+
+# Initialize DB (creates DB and tables if missing). Make sure environment variables are set if not using defaults.
+# Cached so it runs once per worker process instead of on every rerun.
+@st.cache_resource(show_spinner=False)
+def init_db_once():
+    init_db()
+
+
+init_db_once()
+
 # --- Helpers ---
 
 def require_login():
@@ -28,6 +37,23 @@ def require_login():
 require_login()
 
 
+CARD_LINES = {
+    'location': lambda ev: f"📍 Location: {html.escape(ev.get('location') or 'N/A')}",
+    'date': lambda ev: f"📅 Date: {ev['date_label']}",
+    'time': lambda ev: f"🕒 Time: {ev['time_label']}",
+    'price': lambda ev: f"💵 Price: {ev['price_label']}",
+}
+
+
+def show_event_card(ev, lines):
+    """Static part of an event card; date/time/price labels are precomputed by db."""
+    body = "  \n".join(CARD_LINES[line](ev) for line in lines)
+    # rendered with unsafe_allow_html, so user-entered text must be escaped
+    title = html.escape(ev['title'] or '')
+    description = html.escape(ev['description'] or '')
+    st.markdown(f"### {title}\n<p style='color: gray'>{description}</p>\n\n{body}", unsafe_allow_html=True)
+
+
 def show_login():
     st.title("UofA Events Registration Portal")
 
@@ -109,8 +135,18 @@ def show_login():
             
 
 
+def registration_status_cache(user):
+    """The logged-in user's registration status per event, kept in this session's state."""
+    cache = st.session_state.get('reg_status')
+    if cache is None or cache.user_id != user['user_id']:
+        cache = RegistrationStatusCache(user['user_id'])
+        st.session_state['reg_status'] = cache
+    return cache
+
+
 def logout():
     st.session_state.user = None
+    st.session_state.pop('reg_status', None)
     st.success("Logged out successfully.")
     st.rerun()
     
@@ -118,253 +154,285 @@ def logout():
 
 # --- Pages ---
 
-if not st.session_state.user:
-    show_login()
-else:
-    user = st.session_state.user
-    st.sidebar.write(f"Logged in as: {user['first_name']} {user['last_name']}")
-    if st.sidebar.button("Logout"):
-        logout()
-        st.sidebar.markdown("---")
-    with st.sidebar.expander("My Saved Cards"):
-        cards = get_saved_cards(user['user_id'])
-        if cards:
-            for c in cards:
-                st.write(f"{c['card_holder_name']} (****{c['card_number_decrypted'][-4:]})")
-        else:
-            st.info("No saved cards yet.")
+# Count queries/connections made during this rerun. Runs ending in st.rerun(),
+# st.stop() or an error are checked too, but without replacing that exception.
+query_budget.begin_rerun()
+try:
+    if not st.session_state.user:
+        show_login()
+    else:
+        user = st.session_state.user
+        st.sidebar.write(f"Logged in as: {user['first_name']} {user['last_name']}")
+        if st.sidebar.button("Logout"):
+            logout()
+            st.sidebar.markdown("---")
+        with st.sidebar.expander("My Saved Cards"):
+            cards = get_saved_cards(user['user_id'])
+            if cards:
+                for c in cards:
+                    st.write(f"{c['card_holder_name']} (****{c['card_number_decrypted'][-4:]})")
+            else:
+                st.info("No saved cards yet.")
     
-    if st.session_state.get('confirmation'):
-        st.success(st.session_state['confirmation'])
-        time.sleep(3)
-        st.session_state.pop('confirmation') 
-        st.rerun()
-
-    #Admin/Organizer Dashboard
-    if user['user_role'] in ['Admin', 'Organizer']:
-        st.title("Admin Dashboard")
-        tab = st.tabs(["Stats & Events", "Add Event"])
-
-        # --- Stats & Events Tab ---
-        with tab[0]:
-            st.header("Events & Stats")
-            events = list_events()
-            if not events:
-                st.info("No events yet. Add one from 'Add Event' tab.")
-            for ev in events:
-                col1, col2 = st.columns([3,1])
-                with col1:
-                    
-                    st.markdown(f"### {ev['title']}")
-                    st.markdown(f"<p style='color: gray'>{ev['description']}</p>", unsafe_allow_html=True)
-                    formatted_date = ev['event_date'].strftime("%d %b %Y")
-                    st.write("📅 Date:", formatted_date)
-                    st.write("📍 Location:", ev.get('location', 'N/A'))
-                    st.write("💵 Price:", f"${ev['price']:.2f}")
-                    st.markdown('--------')
-                with col2: 
-                    stats = event_stats(ev['id'])
-                    st.metric("Registrations", stats['registrations'])
-                    st.metric("Revenue", f"${stats['revenue']:.2f}")
-
-                    if st.button("🗑️ Delete", key=f"del_{ev['id']}"):
-                        st.session_state['confirm_delete'] = ev['id']
-
-                # Confirmation dialog
-                if st.session_state.get('confirm_delete') == ev['id']:
-                    st.warning(f"Are you sure you want to delete **{ev['title']}**?")
-                    col_c1, col_c2 = st.columns(2)
-                    with col_c1:
-                        if st.button("✅ Yes, delete", key=f"yes_{ev['id']}"):
-                            delete_event(ev['id'])
-                            st.success(f"Event **{ev['title']}** deleted successfully!")
-                            st.session_state.pop('confirm_delete', None)
-                            st.rerun()
-                    with col_c2:
-                        if st.button("❌ Cancel", key=f"cancel_{ev['id']}"):
-                            st.session_state.pop('confirm_delete', None)
-                            st.info("Delete cancelled.")
-
-        # --- Add Event Tab ---
-        with tab[1]:
-            st.header("Add Event")
-            with st.form("add_event_form"):
-                title = st.text_input("Title")
-                description = st.text_area("Description")
-                date = st.date_input("Event date", value=datetime.date.today())
-                event_time = st.time_input("Event time", value=datetime.datetime.now().time())
-                location = st.text_input("Location")
-                event_type = st.selectbox("Event Type", ["Conference", "Workshop", "Seminar", "Meetup","Technical Talk", 'Health & Wellness', 'Cultural', 'Sports', 'Other'])
-                price = st.number_input("Price", min_value=0.0, value=0.0, format="%.2f")
-                submitted = st.form_submit_button("Add event")
-                if submitted:
-                    if not title or not description or not location or not date or not event_time:
-                        st.error("All fields are required.")
-                    dt = datetime.datetime.combine(date, event_time)
-                    add_event(title, description, dt, event_time, location, event_type, user['user_id'],price)
-                    st.success("Event added")
-                    st.rerun()
+        if st.session_state.get('confirmation'):
+            st.success(st.session_state['confirmation'])
+            time.sleep(3)
+            st.session_state.pop('confirmation') 
+            st.rerun()
 
-    # --- User Dashboard ---
-    else:
-        tab_events, tab_regs = st.tabs(["Events", "My Registrations"])
-        with tab_events:
-            if not st.session_state.get('show_payment', False):
-                st.title("Events")
+        #Admin/Organizer Dashboard
+        if user['user_role'] in ['Admin', 'Organizer']:
+            st.title("Admin Dashboard")
+            tab = st.tabs(["Stats & Events", "Add Event", "Analytics"])
+
+            # --- Stats & Events Tab ---
+            with tab[0]:
+                st.header("Events & Stats")
                 events = list_events()
+                # events past ARCHIVE_AFTER_DAYS stay listed, so count their archived rows too
+                stats_by_event = all_event_stats(include_archived=True)
                 if not events:
-                    st.info("No events currently available.")
+                    st.info("No events yet. Add one from 'Add Event' tab.")
                 for ev in events:
-                    st.markdown("---")
-                    st.markdown(f"### {ev['title']}")
-                    st.markdown(f"<p style='color: gray'>{ev['description']}</p>", unsafe_allow_html=True)
-                    st.write("📍 Location:", ev.get('location', 'N/A'))
-                    formatted_date = ev['event_date'].strftime("%d %b %Y")  
-                    st.write("📅 Date:", formatted_date)
-                    if isinstance(ev['event_time'], timedelta):
-                        total_seconds = int(ev['event_time'].total_seconds())
-                        hrs = (total_seconds // 3600) % 24
-                        mins = (total_seconds % 3600) // 60
-                        event_time = datetime.datetime.strptime(f"{hrs}:{mins}", "%H:%M").time()
-                    st.write("🕒 Time:", event_time.strftime("%I:%M %p"))
-                    st.write("💵 Price:", f"${ev['price']:.2f}")
-
-                    # Expander for registration
-                    with st.expander("Register for this event"):
-                        name = st.text_input("Full name", key=f"name_{ev['id']}")
-                        contact_email = st.text_input("Contact email", key=f"email_{ev['id']}")
-                        if st.button("Proceed to payment", key=f"pay_{ev['id']}"):
-                            if not name or not contact_email:
-                                st.error("Provide name and email")
-                            else:
-                                # create registration
-                                registration_id = register_user_for_event(user['user_id'], ev['id'])
-                                if float(ev['price']) == 0.0:
-                                    record_payment(user['user_id'],registration_id)
-                                    st.success("Event registered successfully!")
+                    col1, col2 = st.columns([3,1])
+                    with col1:
+                        show_event_card(ev, ('date', 'location', 'price'))
+                        st.markdown('--------')
+                    with col2: 
+                        stats = stats_by_event.get(ev['id'], {'registrations': 0, 'revenue': 0.0})
+                        st.metric("Registrations", stats['registrations'])
+                        st.metric("Revenue", f"${stats['revenue']:.2f}")
+
+                        if st.button("🗑️ Delete", key=f"del_{ev['id']}"):
+                            st.session_state['confirm_delete'] = ev['id']
+
+                    # Confirmation dialog
+                    if st.session_state.get('confirm_delete') == ev['id']:
+                        st.warning(f"Are you sure you want to delete **{ev['title']}**?")
+                        col_c1, col_c2 = st.columns(2)
+                        with col_c1:
+                            if st.button("✅ Yes, delete", key=f"yes_{ev['id']}"):
+                                delete_event(ev['id'])
+                                st.success(f"Event **{ev['title']}** deleted successfully!")
+                                st.session_state.pop('confirm_delete', None)
+                                st.rerun()
+                        with col_c2:
+                            if st.button("❌ Cancel", key=f"cancel_{ev['id']}"):
+                                st.session_state.pop('confirm_delete', None)
+                                st.info("Delete cancelled.")
+
+            # --- Add Event Tab ---
+            with tab[1]:
+                st.header("Add Event")
+                with st.form("add_event_form"):
+                    title = st.text_input("Title")
+                    description = st.text_area("Description")
+                    date = st.date_input("Event date", value=datetime.date.today())
+                    event_time = st.time_input("Event time", value=datetime.datetime.now().time())
+                    location = st.text_input("Location")
+                    event_type = st.selectbox("Event Type", ["Conference", "Workshop", "Seminar", "Meetup","Technical Talk", 'Health & Wellness', 'Cultural', 'Sports', 'Other'])
+                    price = st.number_input("Price", min_value=0.0, value=0.0, format="%.2f")
+                    submitted = st.form_submit_button("Add event")
+                    if submitted:
+                        if not title or not description or not location or not date or not event_time:
+                            st.error("All fields are required.")
+                        dt = datetime.datetime.combine(date, event_time)
+                        add_event(title, description, dt, event_time, location, event_type, user['user_id'],price)
+                        st.success("Event added")
+                        st.rerun()
+
+            # --- Analytics Tab ---
+            with tab[2]:
+                import analytics  # numpy is only needed for admins
+
+                st.header("Analytics")
+                if st.button("🔄 Refresh data"):
+                    analytics.refresh()
+                snapshot = analytics.get_snapshot()
+                st.caption(f"Snapshot from {datetime.datetime.fromtimestamp(snapshot.built_at):%d %b %Y %H:%M:%S}")
+
+                filter_cols = st.columns(3)
+                filters = {}
+                for col, dim in zip(filter_cols, analytics.DIMENSIONS):
+                    with col:
+                        filters[dim] = st.multiselect(dim.replace('_', ' ').title(), list(snapshot.labels[dim]), key=f"an_{dim}")
+                date_range = st.date_input("Event date range", value=(), key="an_dates")
+                include_inactive = st.checkbox("Include deleted events", value=True)
+                group_dim = st.radio("Group by", analytics.DIMENSIONS, horizontal=True,
+                                     format_func=lambda d: d.replace('_', ' ').title())
+
+                start = date_range[0] if len(date_range) > 0 else None
+                end = date_range[1] if len(date_range) > 1 else None
+                mask = snapshot.mask(filters, start, end, include_inactive)
+                totals = snapshot.totals(mask)
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Events", totals['events'])
+                m2.metric("Registrations", totals['registrations'])
+                m3.metric("Revenue", f"${totals['revenue']:.2f}")
+                st.dataframe(snapshot.group_by(group_dim, mask), use_container_width=True)
+
+        # --- User Dashboard ---
+        else:
+            tab_events, tab_regs = st.tabs(["Events", "My Registrations"])
+            with tab_events:
+                if not st.session_state.get('show_payment', False):
+                    st.title("Events")
+                    events = list_events()
+                    # one query for all events, reloaded after a short TTL; kept up to date by register/payment calls
+                    reg_status = registration_status_cache(user)
+                    if not events:
+                        st.info("No events currently available.")
+                    for ev in events:
+                        st.markdown("---")
+                        show_event_card(ev, ('location', 'date', 'time', 'price'))
+
+                        status = reg_status.get(ev['id'])
+                        if status and status['registration_status'] == 'Success':
+                            st.success("✅ You are registered for this event.")
+                            continue
+
+                        # Expander for registration
+                        with st.expander("Complete your registration (payment pending)" if status else "Register for this event"):
+                            name = st.text_input("Full name", key=f"name_{ev['id']}")
+                            contact_email = st.text_input("Contact email", key=f"email_{ev['id']}")
+                            if st.button("Proceed to payment", key=f"pay_{ev['id']}"):
+                                # re-check before writing: another session or worker may have registered or paid
+                                status = reg_status.refresh().get(ev['id'])
+                                if not name or not contact_email:
+                                    st.error("Provide name and email")
+                                elif status and status['registration_status'] == 'Success':
+                                    st.success("✅ You are already registered for this event.")
                                 else:
-                                    # redirect to dummy payment page
-                                    st.session_state['registration_id'] = registration_id
-                                    st.session_state['payment_amount'] = float(ev['price'])
-                                    st.session_state['show_payment'] = True
-                                    st.session_state['current_event'] = ev
-                                    st.success("Registration info saved. Proceed to payment below.")
-                                    st.rerun()
+                                    # reuse a pending registration instead of creating a duplicate row
+                                    registration_id = status['registration_id'] if status else None
+                                    if registration_id is None:
+                                        try:
+                                            registration_id = register_user_for_event(user['user_id'], ev['id'], status_cache=reg_status)
+                                        except RegistrationPending:
+                                            st.warning("Registration is taking longer than usual. It may still go through: "
+                                                       "check My Registrations in a moment before trying again.")
+                                    if registration_id is not None:
+                                        if float(ev['price']) == 0.0:
+                                            record_payment(user['user_id'], registration_id, status_cache=reg_status)
+                                            st.success("Event registered successfully!")
+                                        else:
+                                            # redirect to dummy payment page
+                                            st.session_state['registration_id'] = registration_id
+                                            st.session_state['payment_amount'] = float(ev['price'])
+                                            st.session_state['show_payment'] = True
+                                            st.session_state['current_event'] = ev
+                                            st.success("Registration info saved. Proceed to payment below.")
+                                            st.rerun()
                         
-            # --- Payment Section ---
-            elif st.session_state.get('show_payment'):
-                st.markdown("---")
-                ev = st.session_state['current_event']
-                amt = st.session_state.get('payment_amount', 0.0)
-                st.header(f"Payment for {ev['title']}")
-                st.write(f"Amount: ${amt:.2f}")
-
-                # Optional: cancel button to go back
-                if st.button("Cancel Payment"):
-                    for key in ['registration_id', 'payment_amount', 'show_payment', 'current_event']:
-                        st.session_state.pop(key, None)
-                    st.rerun()
-
-                saved_cards = get_saved_cards(user['user_id'])
-
-                # Saved Cards Section
-                if not saved_cards:
-                    st.warning("No saved cards found. Please add a new one.")
-                    with st.form("add_card_form"):
-                        card_holder = st.text_input("Cardholder Name")
-                        card_number = st.text_input("Card Number", type="password")
-                        cvv = st.text_input("CVV", type="password")
-                        expiry_date = st.text_input("Expiry Date (MM/YY)")
-                        save_card = st.checkbox("Save this card for future use", value=True)
-                        submitted = st.form_submit_button("Pay")
+                # --- Payment Section ---
+                elif st.session_state.get('show_payment'):
+                    st.markdown("---")
+                    ev = st.session_state['current_event']
+                    amt = st.session_state.get('payment_amount', 0.0)
+                    st.header(f"Payment for {ev['title']}")
+                    st.write(f"Amount: ${amt:.2f}")
+
+                    # Optional: cancel button to go back
+                    if st.button("Cancel Payment"):
+                        for key in ['registration_id', 'payment_amount', 'show_payment', 'current_event']:
+                            st.session_state.pop(key, None)
+                        st.rerun()
+
+                    saved_cards = get_saved_cards(user['user_id'])
+
+                    # Saved Cards Section
+                    if not saved_cards:
+                        st.warning("No saved cards found. Please add a new one.")
+                        with st.form("add_card_form"):
+                            card_holder = st.text_input("Cardholder Name")
+                            card_number = st.text_input("Card Number", type="password")
+                            cvv = st.text_input("CVV", type="password")
+                            expiry_date = st.text_input("Expiry Date (MM/YY)")
+                            save_card = st.checkbox("Save this card for future use", value=True)
+                            submitted = st.form_submit_button("Pay")
                         
-                        # Process payment
-                        if submitted:
-                            if not card_holder or not card_number or not cvv:
-                                st.error("Please fill all fields.")
+                            # Process payment
+                            if submitted:
+                                if not card_holder or not card_number or not cvv:
+                                    st.error("Please fill all fields.")
+                                else:
+                                    reg_id = st.session_state['registration_id']
+                                    if save_card:
+                                        add_saved_card(user['user_id'], card_holder, card_number, cvv, expiry_date)
+                                        saved_cards = get_saved_cards(user['user_id'])
+                                        card_id = saved_cards[-1]['card_id']
+                                        payment_type = 'Saved'
+                                    else:
+                                        card_id = None
+                                        payment_type = 'OneTime'
+
+                                    record_payment(user['user_id'], reg_id, card_id, amt, payment_type, status_cache=registration_status_cache(user))
+                                    st.session_state['confirmation'] = f"Payment ({payment_type}) successful! You are registered."
+                                    for key in ['registration_id', 'payment_amount', 'show_payment', 'current_event']:
+                                        st.session_state.pop(key, None)
+                                    st.rerun()
+                    else:
+                        st.subheader("Choose a saved card")
+                        card_options = [f"{c['card_holder_name']} (****{c['card_number_decrypted'][-4:]})" for c in saved_cards]
+                        card_choice = st.selectbox("Select a card", card_options)
+                        selected_card = saved_cards[card_options.index(card_choice)]
+
+                        with st.form("payment_form"):
+                            use_new = st.checkbox("Use a different card")
+                            if use_new:
+                                card_holder = st.text_input("Cardholder Name")
+                                card_number = st.text_input("Card Number", type="password")
+                                cvv = st.text_input("CVV", type="password")
+                                expiry_date = st.text_input("Expiry Date (MM/YY)")
+                                save_card = st.checkbox("Save this new card for future use", value=False)
                             else:
+                                card_holder = selected_card['card_holder_name']
+                                card_number = selected_card['card_number_decrypted']
+                                cvv = decrypt_data(selected_card['cvv_encrypted'])
+                                expiry_date = selected_card['expiry_date']
+                                save_card = False
+
+                            submitted = st.form_submit_button("Pay")
+
+                            if submitted:
                                 reg_id = st.session_state['registration_id']
-                                if save_card:
+                                if use_new and save_card:
                                     add_saved_card(user['user_id'], card_holder, card_number, cvv, expiry_date)
-                                    saved_cards = get_saved_cards(user['user_id'])
-                                    card_id = saved_cards[-1]['card_id']
+                                    new_card_id = get_saved_cards(user['user_id'])[-1]['card_id']
                                     payment_type = 'Saved'
-                                else:
-                                    card_id = None
+                                elif use_new:
+                                    new_card_id = None
                                     payment_type = 'OneTime'
+                                else:
+                                    new_card_id = selected_card['card_id']
+                                    payment_type = 'Saved'
 
-                                record_payment(user['user_id'], reg_id, card_id, amt, payment_type)
+                                record_payment(user['user_id'], reg_id, new_card_id, amt, payment_type, status_cache=registration_status_cache(user))
                                 st.session_state['confirmation'] = f"Payment ({payment_type}) successful! You are registered."
                                 for key in ['registration_id', 'payment_amount', 'show_payment', 'current_event']:
                                     st.session_state.pop(key, None)
                                 st.rerun()
+            with tab_regs:
+                st.title("My Registered Events")
+
+                # Fetch user registrations
+                registrations = get_user_registrations(user['user_id'], include_archived=True)
+
+                if not registrations:
+                    st.info("You have not registered for any events yet.")
                 else:
-                    st.subheader("Choose a saved card")
-                    card_options = [f"{c['card_holder_name']} (****{c['card_number_decrypted'][-4:]})" for c in saved_cards]
-                    card_choice = st.selectbox("Select a card", card_options)
-                    selected_card = saved_cards[card_options.index(card_choice)]
-
-                    with st.form("payment_form"):
-                        use_new = st.checkbox("Use a different card")
-                        if use_new:
-                            card_holder = st.text_input("Cardholder Name")
-                            card_number = st.text_input("Card Number", type="password")
-                            cvv = st.text_input("CVV", type="password")
-                            expiry_date = st.text_input("Expiry Date (MM/YY)")
-                            save_card = st.checkbox("Save this new card for future use", value=False)
-                        else:
-                            card_holder = selected_card['card_holder_name']
-                            card_number = selected_card['card_number_decrypted']
-                            cvv = decrypt_data(selected_card['cvv_encrypted'])
-                            expiry_date = selected_card['expiry_date']
-                            save_card = False
-
-                        submitted = st.form_submit_button("Pay")
-
-                        if submitted:
-                            reg_id = st.session_state['registration_id']
-                            if use_new and save_card:
-                                add_saved_card(user['user_id'], card_holder, card_number, cvv, expiry_date)
-                                new_card_id = get_saved_cards(user['user_id'])[-1]['card_id']
-                                payment_type = 'Saved'
-                            elif use_new:
-                                new_card_id = None
-                                payment_type = 'OneTime'
-                            else:
-                                new_card_id = selected_card['card_id']
-                                payment_type = 'Saved'
-
-                            record_payment(user['user_id'], reg_id, new_card_id, amt, payment_type)
-                            st.session_state['confirmation'] = f"Payment ({payment_type}) successful! You are registered."
-                            for key in ['registration_id', 'payment_amount', 'show_payment', 'current_event']:
-                                st.session_state.pop(key, None)
-                            st.rerun()
-        with tab_regs:
-            st.title("My Registered Events")
-
-            # Fetch user registrations
-            registrations = get_user_registrations(user['user_id'])
-
-            if not registrations:
-                st.info("You have not registered for any events yet.")
-            else:
-                for reg in registrations:
-                    st.markdown(f"### {reg['title']}")
-                    st.markdown(f"<p style='color: gray'>{ev['description']}</p>", unsafe_allow_html=True)
-                    formatted_date = reg['event_date'].strftime("%d %b %Y")  
-                    st.write("📅 Date:", formatted_date)
-                    if isinstance(ev['event_time'], timedelta):
-                        total_seconds = int(ev['event_time'].total_seconds())
-                        hrs = (total_seconds // 3600) % 24
-                        mins = (total_seconds % 3600) // 60
-                        event_time = datetime.datetime.strptime(f"{hrs}:{mins}", "%H:%M").time()
-                    st.write("🕒 Time:", event_time.strftime("%I:%M %p"))
-                    st.write("💵 Price:", f"${reg['price']:.2f}")
-                    st.write("📝 Registration Status:", reg['registration_status'])
-                    st.write("💳 Payment Status:", reg['payment_status'])
-                    st.markdown("---")
+                    for reg in registrations:
+                        show_event_card(reg, ('date', 'time', 'price'))
+                        st.write("📝 Registration Status:", reg['registration_status'])
+                        st.write("💳 Payment Status:", reg['payment_status'])
+                        st.markdown("---")
 
 
 
-    st.sidebar.markdown("---")
-    st.sidebar.write("App powered by Streamlit")
+        st.sidebar.markdown("---")
+        st.sidebar.write("App powered by Streamlit")
+except BaseException:
+    query_budget.end_rerun(interrupted=True)
+    raise
+else:
+    query_budget.end_rerun()
@@ -1,17 +1,46 @@
 import os
-import mysql.connector
-from mysql.connector import errorcode, Error
 import hashlib
+import queue
+import threading
+from collections import namedtuple
+from functools import lru_cache
 import datetime
 import time
 import socket
-from cryptography.fernet import Fernet
-from dotenv import load_dotenv
-try:
-    # loading .env file for local development
-    load_dotenv("project.env")
-except Exception as e:
-    print(f"Warning: Could not load .env file: {e}")
+
+from query_budget import note_connection, note_query
+
+# The MySQL driver, cryptography and dotenv are comparatively slow to import,
+# so they are loaded on first use rather than at import time. This keeps
+# worker start-up and the login page render fast (see startup_profile.py).
+
+
+@lru_cache(maxsize=None)
+def _load_env():
+    """Load project.env once, the first time configuration is needed."""
+    try:
+        # loading .env file for local development
+        from dotenv import load_dotenv
+        load_dotenv("project.env")
+    except Exception as e:
+        print(f"Warning: Could not load .env file: {e}")
+
+
+def _env(name, default=None):
+    """Read a setting after project.env has been loaded, so .env values take effect."""
+    _load_env()
+    return os.environ.get(name, default)
+
+
+def _db_settings():
+    _load_env()
+    return {
+        'host': os.environ.get("DB_HOST", "127.0.0.1"),
+        'port': int(os.environ.get("DB_PORT", "3306")),
+        'user': os.environ.get("DB_USER", "root"),
+        'password': os.environ.get("DB_PASSWORD"),
+        'database': os.environ.get("DB_NAME"),
+    }
 
 
 def is_port_open(host, port, timeout=2):
@@ -26,11 +55,9 @@ def is_port_open(host, port, timeout=2):
 
 
 def get_connection(max_retries=3, retry_delay=2):
-    host = os.environ.get("DB_HOST", "127.0.0.1")
-    port = int(os.environ.get("DB_PORT", "3306"))
-    user = os.environ.get("DB_USER", "root")
-    password = os.environ.get("DB_PASSWORD")
-    database = os.environ.get("DB_NAME")
+    import mysql.connector
+    settings = _db_settings()
+    host, port = settings['host'], settings['port']
 
     # First check if MySQL is running
     if not is_port_open(host, port):
@@ -39,18 +66,13 @@ def get_connection(max_retries=3, retry_delay=2):
     # Simpler connection (avoid pool on small single-process app to prevent pool exhaustion)
     for attempt in range(max_retries):
         try:
-            conn = mysql.connector.connect(
-                host=host,
-                port=port,
-                user=user,
-                password=password,
-                database=database,
-                connection_timeout=10)
+            conn = mysql.connector.connect(**settings, connection_timeout=10)
             try:
                 # mysql-connector: set autocommit via attribute
                 conn.autocommit = True
             except Exception:
                 pass
+            note_connection()
             return conn
         except mysql.connector.Error as e:
             if attempt == max_retries - 1:
@@ -59,17 +81,392 @@ def get_connection(max_retries=3, retry_delay=2):
             time.sleep(retry_delay)
 
 
+# Connection pool for hot read queries
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Create the shared connection pool on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                import mysql.connector.pooling
+                settings = _db_settings()
+                host, port = settings['host'], settings['port']
+                if not is_port_open(host, port):
+                    raise ConnectionError(f"MySQL server not running or not accessible at {host}:{port}")
+                # pool_reset_session=False keeps server-side prepared statements
+                # alive when a connection goes back to the pool
+                _pool = mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name="events_pool",
+                    pool_size=int(os.environ.get("DB_POOL_SIZE", "5")),
+                    pool_reset_session=False,
+                    **settings,
+                    autocommit=True,
+                    connection_timeout=10)
+    return _pool
+
+
+def get_pooled_connection(timeout=10, retry_delay=0.05):
+    """Borrow a connection from the pool, waiting while all are in use."""
+    import mysql.connector
+    pool = _get_pool()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = pool.get_connection()
+            note_connection()
+            return conn
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise ConnectionError(f"No pooled MySQL connection available after {timeout} seconds")
+            time.sleep(retry_delay)
+
+
+# Query registry
+#
+# Hot queries are declared once below. Each one runs as a server-side prepared
+# statement whose cursor is kept per pooled connection, so the server parses
+# the SQL once per connection, and rows are built straight into a compact
+# record whose fields are the SQL aliases (the key names used by app.py).
+
+class _RecordAccess:
+    """Dict-style access for records: rec['title'], rec.get('location'), 'title' in rec."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    def keys(self):
+        return self._fields
+
+
+def _record_type(name, fields):
+    """namedtuple with dict-style access, bound as a db module attribute so records pickle."""
+    record = type(name, (_RecordAccess, namedtuple(name, fields)), {'__slots__': ()})
+    record.__module__ = __name__
+    record.__qualname__ = name
+    globals()[name] = record
+    return record
+
+
+class Query:
+    __slots__ = ('name', 'sql', 'columns', 'record', 'converters', 'derived')
+
+    def __init__(self, name, sql, fields, converters=None, derived=None):
+        self.name = name
+        self.sql = sql
+        self.columns = tuple(fields)
+        # derived fields are computed once per row from the converted columns
+        self.derived = tuple((derived or {}).items())
+        self.record = _record_type(name.title().replace('_', ''),
+                                   self.columns + tuple(f for f, _ in self.derived))
+        converters = converters or {}
+        # one entry per column so rows can be converted positionally
+        self.converters = tuple(converters.get(f) for f in fields) if converters else None
+
+    def build(self, row):
+        if self.converters is not None:
+            row = [c(v) if c and v is not None else v for c, v in zip(self.converters, row)]
+        if self.derived:
+            named = dict(zip(self.columns, row))
+            row = list(row)
+            row.extend(fn(named) for _, fn in self.derived)
+        return self.record._make(row)
+
+
+QUERIES = {}
+
+# (id(raw connection), query name) -> prepared cursor
+_prepared_cursors = {}
+
+
+def register_query(name, sql, fields, converters=None, derived=None):
+    QUERIES[name] = Query(name, sql, fields, converters, derived)
+    return QUERIES[name]
+
+
+# Registrations and payments of finished or deleted events are moved to
+# *_archive tables by archive_event_history(), a whole event at a time.
+# Per-user reads are written against {registrations}/{payments} placeholders
+# and registered twice: <name> on the live tables, and <name>_archived as the
+# same query on the live tables UNION ALL the archive tables. Each branch keeps
+# its own WHERE, so both stay index-bounded; callers of an _archived query pass
+# the parameters twice. Archived per-event totals live in event_archive_stats.
+_LIVE_TABLES = {'registrations': 'registrations', 'payments': 'payments'}
+_ARCHIVE_TABLES = {'registrations': 'registrations_archive', 'payments': 'payments_archive'}
+
+
+def register_archivable_query(name, sql, fields, converters=None, derived=None, order_by=None):
+    order = f" ORDER BY {order_by}" if order_by else ""
+    live = sql.format(**_LIVE_TABLES)
+    archive = sql.format(**_ARCHIVE_TABLES)
+    register_query(name + '_archived', f"({live}) UNION ALL ({archive}){order}", fields, converters, derived)
+    return register_query(name, live + order, fields, converters, derived)
+
+
+def _latest_per_event(rows):
+    """{event_id: row} keeping the newest registration, should an event have live and archived rows."""
+    latest = {}
+    for row in rows:
+        current = latest.get(row.event_id)
+        if current is None or row.registration_id > current.registration_id:
+            latest[row.event_id] = row
+    return latest
+
+
+def _prepared_cursor(conn, query):
+    raw = getattr(conn, '_cnx', conn)
+    key = (id(raw), query.name)
+    cursor = _prepared_cursors.get(key)
+    if cursor is None:
+        cursor = raw.cursor(prepared=True)
+        _prepared_cursors[key] = cursor
+    return key, cursor
+
+
+def run_query(name, params=(), one=False, raw=False):
+    """Execute a registered query and return a record (one=True) or a list of records.
+
+    raw=True returns the driver's row tuples unchanged, for bulk consumers that
+    convert whole columns themselves.
+    """
+    import mysql.connector
+    from mysql.connector import errorcode
+    query = QUERIES[name]
+    note_query(query.name, params)
+    conn = get_pooled_connection()
+    try:
+        for attempt in range(2):
+            key, cursor = _prepared_cursor(conn, query)
+            try:
+                cursor.execute(query.sql, params)
+                rows = cursor.fetchall()
+                break
+            except mysql.connector.Error as err:
+                # connection was reconnected by the pool and lost its statements
+                _prepared_cursors.pop(key, None)
+                stale = getattr(err, 'errno', None) == errorcode.ER_UNKNOWN_STMT_HANDLER or isinstance(
+                    err, (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError))
+                if attempt == 1 or not stale:
+                    raise
+        if raw:
+            return rows
+        if one:
+            return query.build(rows[0]) if rows else None
+        build = query.build
+        return [build(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def _to_time(value):
+    """TIME columns come back as timedelta; normalise them to datetime.time."""
+    if isinstance(value, datetime.timedelta):
+        return (datetime.datetime.min + value % datetime.timedelta(days=1)).time()
+    return value
+
+
+# Event rows are normalised once here so app.py never re-parses or re-formats them
+EVENT_CONVERTERS = {'event_time': _to_time, 'price': float}
+EVENT_LABELS = {
+    'date_label': lambda ev: ev['event_date'].strftime("%d %b %Y") if ev['event_date'] else "N/A",
+    'time_label': lambda ev: ev['event_time'].strftime("%I:%M %p") if ev.get('event_time') else "N/A",
+    'price_label': lambda ev: f"${ev['price'] or 0:.2f}",
+}
+
+
+register_query(
+    'list_events',
+    """
+    SELECT event_id AS id, event_name AS title, event_description AS description,
+           event_date, event_time, location, price
+    FROM events
+    WHERE is_active = 1
+    ORDER BY event_date ASC
+    """,
+    ('id', 'title', 'description', 'event_date', 'event_time', 'location', 'price'),
+    EVENT_CONVERTERS, EVENT_LABELS)
+
+# Cheap change detector for the events table: add_event raises the count and
+# max id, delete_event lowers the active count.
+register_query(
+    'events_fingerprint',
+    """
+    SELECT COUNT(*) AS events, COALESCE(MAX(event_id), 0) AS last_id, COALESCE(SUM(is_active), 0) AS active
+    FROM events
+    """,
+    ('events', 'last_id', 'active'))
+
+register_query(
+    'get_event',
+    """
+    SELECT event_id AS id, event_name AS title, event_description AS description,
+           event_date, event_time, price
+    FROM events
+    WHERE event_id = %s
+    """,
+    ('id', 'title', 'description', 'event_date', 'event_time', 'price'),
+    EVENT_CONVERTERS, EVENT_LABELS)
+
+register_query(
+    'get_user_by_email',
+    """
+    SELECT user_id, first_name, last_name, phone, email, password_hash, user_role
+    FROM users WHERE email = %s
+    """,
+    ('user_id', 'first_name', 'last_name', 'phone', 'email', 'password_hash', 'user_role'))
+
+register_query(
+    'event_stats',
+    """
+    SELECT
+        (SELECT COUNT(*) FROM registrations r WHERE r.event_id = %s) AS registrations,
+        (SELECT COALESCE(SUM(p.amount), 0)
+         FROM payments p
+         JOIN registrations r ON p.registration_id = r.registration_id
+         WHERE r.event_id = %s AND p.payment_status = 'Success') AS revenue
+    """,
+    ('registrations', 'revenue'),
+    {'revenue': float})
+
+register_query(
+    'all_event_stats',
+    """
+    SELECT r.event_id, COUNT(*) AS registrations, COALESCE(SUM(paid.amount), 0) AS revenue
+    FROM registrations r
+    LEFT JOIN (
+        SELECT p.registration_id, SUM(p.amount) AS amount
+        FROM payments p
+        WHERE p.payment_status = 'Success'
+        GROUP BY p.registration_id
+    ) paid ON paid.registration_id = r.registration_id
+    GROUP BY r.event_id
+    """,
+    ('event_id', 'registrations', 'revenue'),
+    {'revenue': float})
+
+register_query(
+    'event_archive_stats',
+    "SELECT registrations, revenue FROM event_archive_stats WHERE event_id = %s",
+    ('registrations', 'revenue'),
+    {'revenue': float})
+
+register_query(
+    'all_event_archive_stats',
+    "SELECT event_id, registrations, revenue FROM event_archive_stats",
+    ('event_id', 'registrations', 'revenue'),
+    {'revenue': float})
+
+register_archivable_query(
+    'get_user_registrations',
+    """
+    SELECT r.registration_id, e.event_id, e.event_name AS title, e.event_description AS description,
+           e.event_date, e.event_time, e.price,
+           r.payment_status AS registration_status,
+           (SELECT p.payment_status
+            FROM {payments} p
+            WHERE p.registration_id = r.registration_id
+            ORDER BY p.payment_date DESC
+            LIMIT 1) AS payment_status
+    FROM {registrations} r
+    JOIN events e ON r.event_id = e.event_id
+    WHERE r.user_id = %s
+      AND r.registration_id = (
+            SELECT MAX(r2.registration_id)
+            FROM {registrations} r2
+            WHERE r2.user_id = r.user_id
+              AND r2.event_id = r.event_id
+      )
+    """,
+    ('registration_id', 'event_id', 'title', 'description', 'event_date', 'event_time', 'price',
+     'registration_status', 'payment_status'),
+    EVENT_CONVERTERS, EVENT_LABELS,
+    order_by='event_date ASC')
+
+
+register_archivable_query(
+    'registration_status',
+    """
+    SELECT r.event_id, r.registration_id, r.payment_status AS registration_status,
+           (SELECT p.payment_status
+            FROM {payments} p
+            WHERE p.registration_id = r.registration_id
+            ORDER BY p.payment_date DESC
+            LIMIT 1) AS payment_status
+    FROM {registrations} r
+    WHERE r.user_id = %s
+      AND r.registration_id = (
+            SELECT MAX(r2.registration_id)
+            FROM {registrations} r2
+            WHERE r2.user_id = r.user_id
+              AND r2.event_id = r.event_id
+      )
+    """,
+    ('event_id', 'registration_id', 'registration_status', 'payment_status'))
+
+_REGISTRATION_FACTS = """
+    SELECT e.event_id, e.event_type, e.location, e.organizer_id, e.event_date, e.is_active,
+           r.registration_id IS NOT NULL AS registered,
+           COALESCE(SUM(CASE WHEN p.payment_status = 'Success' THEN p.amount END), 0) AS revenue
+    FROM events e
+    LEFT JOIN registrations r ON r.event_id = e.event_id
+    LEFT JOIN payments p ON p.registration_id = r.registration_id
+    GROUP BY e.event_id, r.registration_id
+    """
+_REGISTRATION_FACTS_FIELDS = ('event_id', 'event_type', 'location', 'organizer_id', 'event_date', 'is_active',
+                              'registered', 'revenue')
+
+register_query('registration_facts', _REGISTRATION_FACTS, _REGISTRATION_FACTS_FIELDS)
+
+# full history for the periodic analytics snapshot; the archive branch only
+# adds registration rows, events already appear through the live branch
+register_query(
+    'registration_facts_archived',
+    f"""
+    ({_REGISTRATION_FACTS})
+    UNION ALL
+    (SELECT e.event_id, e.event_type, e.location, e.organizer_id, e.event_date, e.is_active,
+            1 AS registered,
+            COALESCE(SUM(CASE WHEN p.payment_status = 'Success' THEN p.amount END), 0) AS revenue
+     FROM registrations_archive r
+     JOIN events e ON e.event_id = r.event_id
+     LEFT JOIN payments_archive p ON p.registration_id = r.registration_id
+     GROUP BY e.event_id, r.registration_id)
+    """,
+    _REGISTRATION_FACTS_FIELDS)
+
+
+def _execute(cursor, sql, params=()):
+    """cursor.execute() for ad-hoc statements, counted against the per-rerun query budget."""
+    note_query(sql, params)
+    return cursor.execute(sql, params)
+
+
 def _hash_password(password: str) -> str:
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 
 def init_db():
     """Create database and tables if they don't exist."""
-    host = os.environ.get("DB_HOST", "127.0.0.1")
-    port = int(os.environ.get("DB_PORT", "3306"))
-    user = os.environ.get("DB_USER", "root")
-    password = os.environ.get("DB_PASSWORD")
-    database = os.environ.get("DB_NAME")
+    import mysql.connector
+    from mysql.connector import errorcode
+    settings = _db_settings()
+    host, port, user = settings['host'], settings['port'], settings['user']
+    password, database = settings['password'], settings['database']
 
     # Ensure password is provided via environment for security
     if not password:
@@ -155,6 +552,18 @@ def init_db():
         ") ENGINE=InnoDB"
     )
 
+    # Archive tables mirror the live columns and indexes (LIKE does not copy foreign keys)
+    TABLES['registrations_archive'] = "CREATE TABLE IF NOT EXISTS registrations_archive LIKE registrations"
+    TABLES['payments_archive'] = "CREATE TABLE IF NOT EXISTS payments_archive LIKE payments"
+    # Per-event totals of archived rows, so stats need not scan the archive tables
+    TABLES['event_archive_stats'] = (
+        "CREATE TABLE IF NOT EXISTS event_archive_stats ("
+        "  event_id INT PRIMARY KEY,"
+        "  registrations INT NOT NULL DEFAULT 0,"
+        "  revenue DECIMAL(12,2) NOT NULL DEFAULT 0.00"
+        ") ENGINE=InnoDB"
+    )
+
     # Create tables with fresh connections per table to avoid stale/pooled connection issues
     for name, ddl in TABLES.items():
         attempts = 3
@@ -204,7 +613,7 @@ def create_user(first_name: str, last_name: str, phone: str, email: str, passwor
     cursor = conn.cursor()
     pw_hash = _hash_password(password)
     try:
-        cursor.execute(
+        _execute(cursor,
             "INSERT INTO users (first_name, last_name, phone, email, password_hash, user_role) "
             "VALUES (%s, %s, %s, %s, %s, %s)",
             (first_name, last_name, phone, email, pw_hash, user_role)
@@ -217,18 +626,7 @@ def create_user(first_name: str, last_name: str, phone: str, email: str, passwor
 
 
 def get_user_by_email(email: str):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(
-            "SELECT user_id, first_name, last_name, phone, email, password_hash, user_role "
-            "FROM users WHERE email=%s",
-            (email,)
-        )
-        return cursor.fetchone()
-    finally:
-        cursor.close()
-        conn.close()
+    return run_query('get_user_by_email', (email,), one=True)
 
 
 def authenticate_user(email: str, password: str):
@@ -252,7 +650,7 @@ def authenticate_user(email: str, password: str):
 def add_event(event_name, event_description, event_date, event_time, location, event_type, organizer_id, price):
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
+    _execute(cursor,
         """
         INSERT INTO events (event_name, event_description, event_date, event_time, location, event_type, organizer_id, price)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
@@ -264,59 +662,23 @@ def add_event(event_name, event_description, event_date, event_time, location, e
     conn.close()
 
 
+# (events_fingerprint, normalised list_events rows)
+_events_cache = None
+
+
 def list_events():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute("""
-            SELECT event_id, event_name, event_description, event_date, event_time,location, price
-            FROM events
-            WHERE is_active = 1
-            ORDER BY event_date ASC
-        """)
-        rows = cursor.fetchall()
-        # Map to keys expected by frontend
-        events = []
-        for ev in rows:
-            events.append({
-                'id': ev['event_id'],                  # map to 'id'
-                'title': ev['event_name'],             # map to 'title'
-                'description': ev['event_description'],# map to 'description'
-                'event_date': ev['event_date'],
-                'event_time': ev['event_time'],
-                'location': ev['location'],
-                'price': float(ev['price'])
-            })
-        return events
-    finally:
-        cursor.close()
-        conn.close()
+    """Active events, fetched and normalised only when the events fingerprint changes."""
+    global _events_cache
+    fingerprint = run_query('events_fingerprint', one=True)
+    cached = _events_cache
+    if cached is None or cached[0] != fingerprint:
+        cached = (fingerprint, run_query('list_events'))
+        _events_cache = cached
+    return list(cached[1])
 
 
 def get_event(event_id: int):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute("""
-            SELECT event_id, event_name, event_description, event_date,event_time, price
-            FROM events
-            WHERE event_id=%s
-        """, (event_id,))
-        ev = cursor.fetchone()
-        if not ev:
-            return None
-        # Map to keys used in frontend
-        return {
-            'id': ev['event_id'],
-            'title': ev['event_name'],
-            'description': ev['event_description'],
-            'event_date': ev['event_date'],
-            'event_time': ev['event_time'],
-            'price': float(ev['price'])
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    return run_query('get_event', (event_id,), one=True)
 
 
 def delete_event(event_id: int):
@@ -324,7 +686,7 @@ def delete_event(event_id: int):
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("UPDATE events SET is_active = 0 WHERE event_id = %s", (event_id,))
+        _execute(cursor, "UPDATE events SET is_active = 0 WHERE event_id = %s", (event_id,))
         conn.commit()
     finally:
         cursor.close()
@@ -333,99 +695,366 @@ def delete_event(event_id: int):
 
 # Registration & payment
 
-def register_user_for_event(user_id: int, event_id: int) -> int:
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "INSERT INTO registrations (user_id, event_id, payment_status) VALUES (%s, %s, %s)",
-            (user_id, event_id, 'Pending')
-        )
-        conn.commit()
-        return cursor.lastrowid
-    finally:
-        cursor.close()
-        conn.close()
+def get_registration_status(user_id: int):
+    """Return {event_id: status} for the user's latest registration per event, archived rows included.
 
+    Each status has registration_id, registration_status and payment_status.
+    """
+    return _latest_per_event(run_query('registration_status_archived', (user_id, user_id)))
 
 
-def event_stats(event_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        # Count total registrations for the event
-        cursor.execute("SELECT COUNT(*) FROM registrations WHERE event_id = %s", (event_id,))
-        total_reg = cursor.fetchone()[0]
-
-        # Sum payments for successful transactions
-        cursor.execute("""
-            SELECT COALESCE(SUM(p.amount), 0)
-            FROM payments p
-            JOIN registrations r ON p.registration_id = r.registration_id
-            WHERE r.event_id = %s AND p.payment_status = 'Success'
-        """, (event_id,))
-        total_amt = cursor.fetchone()[0] or 0.0
-
-        return {'registrations': total_reg, 'revenue': float(total_amt)}
-    finally:
-        cursor.close()
-        conn.close()
+class RegistrationStatusCache:
+    """One user's registration status per event, kept in a session's state.
+
+    Loaded with a single query and reloaded once it is older than ttl seconds
+    (REGISTRATION_STATUS_TTL, default 30). Archived rows are read too, so
+    archival does not change what it holds.
+    register_user_for_event and record_payment update it in place when passed
+    as status_cache. Writes from other sessions or workers only show up after a
+    reload, so call refresh() before acting on a status.
+    """
+
+    def __init__(self, user_id, ttl=None):
+        self.user_id = user_id
+        self.ttl = float(_env("REGISTRATION_STATUS_TTL", "30")) if ttl is None else ttl
+        self._statuses = None
+        self._loaded_at = 0.0
+
+    def refresh(self):
+        self._statuses = get_registration_status(self.user_id)
+        self._loaded_at = time.monotonic()
+        return self
+
+    def get(self, event_id):
+        if self._statuses is None or time.monotonic() - self._loaded_at > self.ttl:
+            self.refresh()
+        return self._statuses.get(event_id)
+
+    def note_registration(self, event_id, registration_id):
+        if self._statuses is not None:
+            record = QUERIES['registration_status_archived'].record
+            self._statuses[event_id] = record(event_id, registration_id, 'Pending', None)
+
+    def note_payment(self, registration_id, payment_status):
+        if self._statuses is None:
+            return
+        for event_id, status in self._statuses.items():
+            if status.registration_id == registration_id:
+                self._statuses[event_id] = status._replace(registration_status='Success', payment_status=payment_status)
+                return
+
+
+_INSERT_REGISTRATION = "INSERT INTO registrations (user_id, event_id, payment_status) VALUES (%s, %s, %s)"
+
+# Group commit: with REGISTRATION_GROUP_COMMIT_MS > 0, registrations arriving
+# within that window are written by one background thread in a single
+# transaction, so a burst pays for one commit instead of one per click.
+# Settings are read on first registration, after project.env is loaded:
+#   REGISTRATION_GROUP_COMMIT_MS          batching window, 0 disables (default 0)
+#   REGISTRATION_GROUP_COMMIT_MAX_BATCH   rows per transaction (default 100)
+#   REGISTRATION_GROUP_COMMIT_MAX_PENDING queued requests before falling back
+#                                         to a direct insert (default 1000)
+#   REGISTRATION_GROUP_COMMIT_TIMEOUT     seconds a caller waits (default 30)
+
+
+class RegistrationPending(Exception):
+    """The buffered registration was not confirmed in time; it may still be committed.
 
+    Resubmitting the same user/event while it is queued joins the original
+    request instead of inserting a second row.
+    """
 
 
-def get_user_registrations(user_id: int):
+class RegistrationBuffer:
+    """Buffers registration inserts and flushes them as one transaction.
+
+    Callers get a Future that resolves to their registration_id only after the
+    batch has committed, so nothing is acknowledged before it is durable. A
+    row rejected by the database (e.g. unknown event) fails only its own
+    Future; any other error rolls back the batch and fails every Future in it.
+    """
+
+    def __init__(self, window_ms, max_batch, max_pending, timeout):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        # (user_id, event_id) -> Future of the request still queued or being flushed
+        self._in_flight = {}
+
+    def submit(self, user_id, event_id):
+        """Queue a registration; returns None when the buffer is full so the caller can insert directly."""
+        from concurrent.futures import Future
+        key = (user_id, event_id)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="registration-group-commit", daemon=True)
+                self._thread.start()
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            try:
+                self._queue.put_nowait((user_id, event_id, future))
+            except queue.Full:
+                return None
+            self._in_flight[key] = future
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._flush(batch)
+            finally:
+                with self._lock:
+                    for user_id, event_id, _ in batch:
+                        self._in_flight.pop((user_id, event_id), None)
+
+    def _flush(self, batch):
+        import mysql.connector
+        results = []
+        conn = cursor = None
+        try:
+            conn = get_pooled_connection()
+            cursor = conn.cursor()
+            conn.start_transaction()
+            for user_id, event_id, future in batch:
+                try:
+                    cursor.execute(_INSERT_REGISTRATION, (user_id, event_id, 'Pending'))
+                    results.append((future, cursor.lastrowid))
+                except (mysql.connector.IntegrityError, mysql.connector.DataError) as err:
+                    # only this statement is rolled back; the rest of the batch continues
+                    results.append((future, err))
+            conn.commit()
+        except Exception as err:
+            try:
+                if conn is not None:
+                    conn.rollback()
+            except Exception:
+                pass
+            for _, _, future in batch:
+                future.set_exception(err)
+            return
+        finally:
+            if cursor is not None:
+                cursor.close()
+            if conn is not None:
+                conn.close()
+
+        for future, result in results:
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+_registration_buffer = None
+_registration_buffer_lock = threading.Lock()
+
+
+def _get_registration_buffer():
+    """The shared buffer, or None when group commit is disabled."""
+    global _registration_buffer
+    if _registration_buffer is None:
+        with _registration_buffer_lock:
+            if _registration_buffer is None:
+                _registration_buffer = RegistrationBuffer(
+                    float(_env("REGISTRATION_GROUP_COMMIT_MS", "0")),
+                    int(_env("REGISTRATION_GROUP_COMMIT_MAX_BATCH", "100")),
+                    int(_env("REGISTRATION_GROUP_COMMIT_MAX_PENDING", "1000")),
+                    float(_env("REGISTRATION_GROUP_COMMIT_TIMEOUT", "30")))
+    return _registration_buffer if _registration_buffer.window > 0 else None
+
+
+def register_user_for_event(user_id: int, event_id: int, status_cache: RegistrationStatusCache = None) -> int:
+    """Insert a pending registration and return its id.
+
+    Raises RegistrationPending if group commit is on and the batch was not
+    confirmed within REGISTRATION_GROUP_COMMIT_TIMEOUT seconds.
+    """
+    buffer = _get_registration_buffer()
+    future = buffer.submit(user_id, event_id) if buffer is not None else None
+    if future is not None:
+        # not the builtin TimeoutError: they are only the same class from Python 3.11
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        note_query(_INSERT_REGISTRATION, (user_id, event_id, 'Pending'))
+        try:
+            registration_id = future.result(timeout=buffer.timeout)
+        except FutureTimeoutError:
+            raise RegistrationPending(
+                f"Registration of user {user_id} for event {event_id} not confirmed after {buffer.timeout} seconds") from None
+    else:
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            _execute(cursor, _INSERT_REGISTRATION, (user_id, event_id, 'Pending'))
+            conn.commit()
+            registration_id = cursor.lastrowid
+        finally:
+            cursor.close()
+            conn.close()
+    if status_cache is not None:
+        status_cache.note_registration(event_id, registration_id)
+    return registration_id
+
+
+
+def event_stats(event_id: int, include_archived: bool = False):
+    stats = run_query('event_stats', (event_id, event_id), one=True)
+    registrations, revenue = stats.registrations, stats.revenue
+    if include_archived:
+        archived = run_query('event_archive_stats', (event_id,), one=True)
+        if archived:
+            registrations += archived.registrations
+            revenue += archived.revenue
+    return {'registrations': registrations, 'revenue': revenue}
+
+
+def all_event_stats(include_archived: bool = False):
+    """Registrations and revenue for every event: {event_id: {'registrations', 'revenue'}}.
+
+    Archived rows are counted from the event_archive_stats summary, not the archive tables.
+    """
+    stats = {s.event_id: {'registrations': s.registrations, 'revenue': s.revenue} for s in run_query('all_event_stats')}
+    if include_archived:
+        for s in run_query('all_event_archive_stats'):
+            totals = stats.setdefault(s.event_id, {'registrations': 0, 'revenue': 0.0})
+            totals['registrations'] += s.registrations
+            totals['revenue'] += s.revenue
+    return stats
+
+
+def get_user_registrations(user_id: int, include_archived: bool = False):
     """Return a list of registrations for a user with event info and latest payment status."""
+    if not include_archived:
+        return run_query('get_user_registrations', (user_id,))
+    rows = run_query('get_user_registrations_archived', (user_id, user_id))
+    latest = _latest_per_event(rows)
+    return [row for row in rows if latest[row.event_id] is row]
+
+
+def get_registration_facts(include_archived: bool = False):
+    """One row per (event, registration) with paid revenue; events without registrations appear once."""
+    name = 'registration_facts_archived' if include_archived else 'registration_facts'
+    return run_query(name, raw=True)
+
+
+# Archival
+
+def archive_event_history(older_than_days: int = None, batch_size: int = 500, pause: float = 0.2, max_batches: int = None) -> int:
+    """Move registrations and payments of deleted or finished events to the archive tables.
+
+    An event qualifies when it is soft-deleted (is_active = 0) or took place more
+    than older_than_days ago (default: ARCHIVE_AFTER_DAYS, 30). The qualifying
+    events are selected once; their registrations are then paged by
+    registration_id, batch_size at a time, each batch in its own short
+    transaction, sleeping pause seconds between batches so the live tables are
+    never locked for long. Each batch also adds its per-event totals to
+    event_archive_stats. Returns the number of registrations archived.
+    """
+    if older_than_days is None:
+        older_than_days = int(_env("ARCHIVE_AFTER_DAYS", "30"))
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
+    archived = 0
+    batches = 0
+    last_id = 0
     try:
-        cursor.execute(
-            """
-            SELECT r.registration_id, e.event_id, e.event_name AS title, e.event_description AS description,
-                   e.event_date, e.price,
-                   r.payment_status AS registration_status,
-                   (SELECT p.payment_status 
-                    FROM payments p 
-                    WHERE p.registration_id = r.registration_id 
-                    ORDER BY p.payment_date DESC 
-                    LIMIT 1) as payment_status
-            FROM registrations r
-            JOIN events e ON r.event_id = e.event_id
-            WHERE r.user_id = %s
-              AND r.registration_id = (
-                    SELECT MAX(r2.registration_id)
-                    FROM registrations r2
-                    WHERE r2.user_id = r.user_id
-                      AND r2.event_id = r.event_id
-              )
-            ORDER BY e.event_date ASC
-            """,
-            (user_id,)
-        )
-        return cursor.fetchall()
+        _execute(cursor, """
+            SELECT event_id
+            FROM events
+            WHERE is_active = 0 OR event_date < NOW() - INTERVAL %s DAY
+        """, (older_than_days,))
+        event_ids = [row[0] for row in cursor.fetchall()]
+        if not event_ids:
+            return 0
+        in_events = ", ".join(["%s"] * len(event_ids))
+
+        while max_batches is None or batches < max_batches:
+            _execute(cursor, f"""
+                SELECT registration_id
+                FROM registrations
+                WHERE event_id IN ({in_events}) AND registration_id > %s
+                ORDER BY registration_id
+                LIMIT %s
+            """, (*event_ids, last_id, batch_size))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            in_ids = ", ".join(["%s"] * len(ids))
+            conn.start_transaction()
+            try:
+                _execute(cursor, f"""
+                    INSERT INTO event_archive_stats (event_id, registrations, revenue)
+                    SELECT r.event_id, COUNT(*), COALESCE(SUM(paid.amount), 0)
+                    FROM registrations r
+                    LEFT JOIN (
+                        SELECT registration_id, SUM(amount) AS amount
+                        FROM payments
+                        WHERE payment_status = 'Success' AND registration_id IN ({in_ids})
+                        GROUP BY registration_id
+                    ) paid ON paid.registration_id = r.registration_id
+                    WHERE r.registration_id IN ({in_ids})
+                    GROUP BY r.event_id
+                    ON DUPLICATE KEY UPDATE
+                        registrations = event_archive_stats.registrations + VALUES(registrations),
+                        revenue = event_archive_stats.revenue + VALUES(revenue)
+                """, ids + ids)
+                _execute(cursor, f"INSERT INTO payments_archive SELECT * FROM payments WHERE registration_id IN ({in_ids})", ids)
+                _execute(cursor, f"INSERT INTO registrations_archive SELECT * FROM registrations WHERE registration_id IN ({in_ids})", ids)
+                _execute(cursor, f"DELETE FROM payments WHERE registration_id IN ({in_ids})", ids)
+                _execute(cursor, f"DELETE FROM registrations WHERE registration_id IN ({in_ids})", ids)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            archived += len(ids)
+            batches += 1
+            if len(ids) < batch_size:
+                break
+            time.sleep(pause)
+        return archived
     finally:
         cursor.close()
         conn.close()
 
 
-
-
-try:
-    fernet_key = os.getenv("FERNET_KEY")
-    fernet = Fernet(fernet_key)
-except Exception as e:
-    print(f"Error initializing Fernet encryption: {e}")
-    raise 
+@lru_cache(maxsize=None)
+def _get_fernet():
+    """Build the Fernet cipher on first use; raises if FERNET_KEY is missing or invalid."""
+    from cryptography.fernet import Fernet
+    _load_env()
+    try:
+        return Fernet(os.getenv("FERNET_KEY"))
+    except Exception as e:
+        print(f"Error initializing Fernet encryption: {e}")
+        raise
 
 def encrypt_data(data):
-    return fernet.encrypt(data.encode()).decode()
+    return _get_fernet().encrypt(data.encode()).decode()
 
 def decrypt_data(data):
-    return fernet.decrypt(data.encode()).decode()
+    return _get_fernet().decrypt(data.encode()).decode()
 
 def get_saved_cards(user_id):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM saved_cards WHERE user_id = %s", (user_id,))
+    _execute(cursor, "SELECT * FROM saved_cards WHERE user_id = %s", (user_id,))
     rows = cursor.fetchall()
     for r in rows:
         r['card_number_decrypted'] = decrypt_data(r['card_number_encrypted'])
@@ -438,7 +1067,7 @@ def add_saved_card(user_id, holder, number, cvv, expiry_date):
     cursor = conn.cursor()
     enc_number = encrypt_data(number)
     enc_cvv = encrypt_data(cvv)
-    cursor.execute("""
+    _execute(cursor, """
         INSERT INTO saved_cards (user_id, card_holder_name, card_number_encrypted, cvv_encrypted, expiry_date)
         VALUES (%s, %s, %s, %s, %s)
     """, (user_id, holder, enc_number, enc_cvv, expiry_date))
@@ -447,22 +1076,24 @@ def add_saved_card(user_id, holder, number, cvv, expiry_date):
     conn.close()
 
     
-def record_payment(user_id: int, registration_id: int, card_id: int = None, amount: float = 0.0, payment_type: str = "Free", payment_status: str = 'Success'):
+def record_payment(user_id: int, registration_id: int, card_id: int = None, amount: float = 0.0, payment_type: str = "Free", payment_status: str = 'Success', status_cache: RegistrationStatusCache = None):
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
+        _execute(cursor, """
             INSERT INTO payments (user_id, registration_id, card_id, amount, payment_type, payment_status)
             VALUES (%s, %s, %s, %s, %s, %s)
         """, (user_id, registration_id, card_id, amount, payment_type, payment_status))
 
-        cursor.execute("""
+        _execute(cursor, """
             UPDATE registrations
             SET payment_status = %s
             WHERE registration_id = %s
         """, ('Success', registration_id))
 
         conn.commit()
+        if status_cache is not None:
+            status_cache.note_payment(registration_id, payment_status)
         return cursor.lastrowid
     finally:
         cursor.close()
@@ -0,0 +1,132 @@
+"""Per-rerun query budget and N+1 detection.
+
+app.py calls begin_rerun() at the top of every script execution and
+end_rerun() at the bottom, also when the run ends in an exception. In between, db.py reports every connection it opens
+and every statement it runs via note_connection()/note_query(). At the end of
+the rerun the counts are checked against the budget:
+
+- more than QUERY_BUDGET_MAX_QUERIES statements or QUERY_BUDGET_MAX_CONNECTIONS
+  connections, or
+- the same query shape run QUERY_BUDGET_N_PLUS_ONE or more times with different
+  parameters (typically a query inside a loop over rows)
+
+is reported according to QUERY_BUDGET_MODE: "warn" (default) issues a
+QueryBudgetWarning, "raise" raises QueryBudgetExceeded, "off" disables tracking.
+Tests can wrap a page or helper in track_queries() to get the same checks.
+"""
+import contextvars
+import os
+import re
+import warnings
+from contextlib import contextmanager
+
+
+class QueryBudgetWarning(UserWarning):
+    pass
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryTracker:
+    def __init__(self, max_queries, max_connections, n_plus_one, mode):
+        self.max_queries = max_queries
+        self.max_connections = max_connections
+        self.n_plus_one = n_plus_one
+        self.mode = mode
+        self.queries = 0
+        self.connections = 0
+        # query shape -> set of distinct parameter tuples it was run with
+        self.shapes = {}
+
+    def note_query(self, shape, params):
+        self.queries += 1
+        self.shapes.setdefault(shape, set()).add(repr(params))
+
+    def note_connection(self):
+        self.connections += 1
+
+    def problems(self):
+        problems = []
+        if self.queries > self.max_queries:
+            problems.append(f"{self.queries} queries (budget {self.max_queries})")
+        if self.connections > self.max_connections:
+            problems.append(f"{self.connections} connections (budget {self.max_connections})")
+        for shape, params in self.shapes.items():
+            if len(params) >= self.n_plus_one:
+                problems.append(f"possible N+1: {shape!r} run with {len(params)} different parameter sets")
+        return problems
+
+    def check(self, mode=None):
+        mode = mode or self.mode
+        problems = self.problems()
+        if not problems or mode == "off":
+            return problems
+        message = "Query budget exceeded in one rerun: " + "; ".join(problems)
+        if mode == "raise":
+            raise QueryBudgetExceeded(message)
+        warnings.warn(message, QueryBudgetWarning, stacklevel=3)
+        return problems
+
+
+_current = contextvars.ContextVar("query_tracker", default=None)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _settings(**overrides):
+    settings = {
+        'max_queries': int(os.environ.get("QUERY_BUDGET_MAX_QUERIES", "30")),
+        'max_connections': int(os.environ.get("QUERY_BUDGET_MAX_CONNECTIONS", "30")),
+        'n_plus_one': int(os.environ.get("QUERY_BUDGET_N_PLUS_ONE", "5")),
+        'mode': os.environ.get("QUERY_BUDGET_MODE", "warn"),
+    }
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return settings
+
+
+def begin_rerun(max_queries=None, max_connections=None, n_plus_one=None, mode=None):
+    """Start counting for a new script run; replaces any tracker left by an interrupted run."""
+    settings = _settings(max_queries=max_queries, max_connections=max_connections,
+                         n_plus_one=n_plus_one, mode=mode)
+    tracker = QueryTracker(**settings) if settings['mode'] != "off" else None
+    _current.set(tracker)
+    return tracker
+
+
+def end_rerun(interrupted=False):
+    """Stop counting and report budget problems; returns the finished tracker (or None).
+
+    Pass interrupted=True when the run is ending with an exception in flight
+    (including st.rerun()/st.stop()): problems are then only warned about, so
+    that exception is not replaced by QueryBudgetExceeded.
+    """
+    tracker = _current.get()
+    _current.set(None)
+    if tracker is not None:
+        tracker.check("warn" if interrupted and tracker.mode == "raise" else None)
+    return tracker
+
+
+@contextmanager
+def track_queries(max_queries=None, max_connections=None, n_plus_one=None, mode="raise"):
+    """Context manager for tests: fails (by default) if the block exceeds its budget."""
+    token = _current.set(None)
+    tracker = begin_rerun(max_queries, max_connections, n_plus_one, mode)
+    try:
+        yield tracker
+        end_rerun()
+    finally:
+        _current.reset(token)
+
+
+def note_query(sql, params=()):
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.note_query(_WHITESPACE.sub(" ", sql).strip(), params)
+
+
+def note_connection():
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.note_connection()
@@ -0,0 +1,53 @@
+"""Report where worker start-up time goes.
+
+Runs ``python -X importtime`` for each module in a fresh interpreter and prints
+the slowest imports (cumulative time, including sub-imports).
+
+Usage:
+    python startup_profile.py                 # profiles db and streamlit
+    python startup_profile.py db --top 15
+"""
+import argparse
+import subprocess
+import sys
+
+
+def import_times(module):
+    """Return [(cumulative_us, self_us, package)] for importing module in a new interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # format: "import time:   self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, package = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), package.rstrip()))
+    return rows
+
+
+def report(module, top=10):
+    rows = import_times(module)
+    # the last line is the requested module itself
+    total = rows[-1][0] if rows else 0
+    print(f"import {module}: {total / 1000:.1f} ms")
+    for cumulative_us, self_us, package in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms) {package}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=["db", "streamlit"])
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports to show")
+    args = parser.parse_args()
+    for module in args.modules:
+        report(module, args.top)
+
+
+if __name__ == "__main__":
+    main()
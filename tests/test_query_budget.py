@@ -0,0 +1,75 @@
+import os
+import sys
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import query_budget
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    """Stands in for a pooled connection; every query returns the same rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, prepared=False):
+        return FakeCursor(self.rows)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def use_rows(rows):
+        conn = FakeConnection(rows)
+        monkeypatch.setattr(db, "get_pooled_connection", lambda: conn)
+        # cached cursors are keyed by id(connection), which a new fake can reuse
+        monkeypatch.setattr(db, "_prepared_cursors", {})
+    return use_rows
+
+
+def test_per_event_stats_loop_is_flagged_as_n_plus_one(fake_db):
+    fake_db([(3, Decimal("30.00"))])
+    with pytest.raises(query_budget.QueryBudgetExceeded, match="N\\+1"):
+        with query_budget.track_queries(n_plus_one=5):
+            for event_id in range(10):
+                db.event_stats(event_id)
+
+
+def test_bulk_event_stats_stays_within_budget(fake_db):
+    fake_db([(event_id, 3, Decimal("30.00")) for event_id in range(10)])
+    with query_budget.track_queries(max_queries=1, n_plus_one=5) as tracker:
+        stats = db.all_event_stats()
+    assert len(stats) == 10
+    assert tracker.queries == 1
+
+
+def test_query_budget_warns_in_warn_mode():
+    with pytest.warns(query_budget.QueryBudgetWarning, match="3 queries"):
+        with query_budget.track_queries(max_queries=2, mode="warn"):
+            for _ in range(3):
+                query_budget.note_query("SELECT 1")
+
+
+def test_interrupted_rerun_only_warns_in_raise_mode():
+    query_budget.begin_rerun(max_queries=1, mode="raise")
+    for _ in range(2):
+        query_budget.note_query("SELECT 1")
+    with pytest.warns(query_budget.QueryBudgetWarning):
+        query_budget.end_rerun(interrupted=True)
@@ -0,0 +1,144 @@
+import itertools
+import os
+import sys
+import threading
+
+import mysql.connector
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+
+    def execute(self, sql, params=()):
+        user_id, event_id, _ = params
+        if event_id in self.conn.bad_events:
+            raise mysql.connector.IntegrityError("Cannot add or update a child row: a foreign key constraint fails")
+        self.lastrowid = next(self.conn.db.ids)
+        self.conn.pending.append((self.lastrowid, user_id, event_id))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db, bad_events):
+        self.db = db
+        self.bad_events = bad_events
+        self.pending = []
+
+    def cursor(self, prepared=False):
+        return FakeCursor(self)
+
+    def start_transaction(self):
+        self.pending = []
+
+    def commit(self):
+        self.db.rows.extend(self.pending)
+        self.db.commits += 1
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    """Stands in for the pool; rows only become visible on commit."""
+
+    def __init__(self, bad_events=()):
+        self.bad_events = set(bad_events)
+        self.rows = []
+        self.commits = 0
+        self.ids = itertools.count(1)
+        # set gate to hold the flush thread before it gets a connection
+        self.gate = None
+        self.entered = threading.Event()
+
+    def connect(self):
+        if threading.current_thread().name == "registration-group-commit":
+            self.entered.set()
+            if self.gate is not None:
+                self.gate.wait(5)
+        return FakeConnection(self, self.bad_events)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(db, "get_pooled_connection", database.connect)
+    monkeypatch.setattr(db, "get_connection", database.connect)
+    return database
+
+
+def make_buffer(window_ms=50, max_batch=100, max_pending=100, timeout=5):
+    return db.RegistrationBuffer(window_ms, max_batch, max_pending, timeout)
+
+
+def test_requests_within_the_window_share_one_commit(fake_db):
+    buffer = make_buffer()
+    futures = [buffer.submit(user_id, 1) for user_id in (1, 2, 3)]
+    ids = [future.result(timeout=5) for future in futures]
+    assert fake_db.commits == 1
+    assert sorted(ids) == [1, 2, 3]
+    assert sorted(row[1] for row in fake_db.rows) == [1, 2, 3]
+
+
+def test_rejected_row_fails_only_its_own_request(fake_db):
+    fake_db.bad_events.add(99)
+    buffer = make_buffer()
+    ok = buffer.submit(1, 1)
+    bad = buffer.submit(2, 99)
+    also_ok = buffer.submit(3, 1)
+    assert ok.result(timeout=5)
+    assert also_ok.result(timeout=5)
+    with pytest.raises(mysql.connector.IntegrityError):
+        bad.result(timeout=5)
+    assert fake_db.commits == 1
+    assert [row[1] for row in fake_db.rows] == [1, 3]
+
+
+def test_resubmitting_a_queued_registration_joins_it(fake_db):
+    buffer = make_buffer(window_ms=200)
+    first = buffer.submit(1, 1)
+    again = buffer.submit(1, 1)
+    assert again is first
+    first.result(timeout=5)
+    assert len(fake_db.rows) == 1
+    # once flushed, the same user/event is a new request again
+    assert buffer.submit(1, 1) is not first
+
+
+def test_full_buffer_falls_back_to_a_direct_insert(fake_db, monkeypatch):
+    fake_db.gate = threading.Event()
+    buffer = make_buffer(window_ms=0, max_pending=1)
+    monkeypatch.setattr(db, "_get_registration_buffer", lambda: buffer)
+
+    held = buffer.submit(1, 1)
+    assert fake_db.entered.wait(5)
+    queued = buffer.submit(2, 1)
+    assert buffer.submit(3, 1) is None
+
+    registration_id = db.register_user_for_event(3, 1)
+    assert [row[0] for row in fake_db.rows] == [registration_id]
+
+    fake_db.gate.set()
+    assert held.result(timeout=5) and queued.result(timeout=5)
+    assert registration_id in {row[0] for row in fake_db.rows}
+    assert sorted(row[1] for row in fake_db.rows) == [1, 2, 3]
+
+
+def test_unconfirmed_registration_raises_pending(fake_db, monkeypatch):
+    fake_db.gate = threading.Event()
+    buffer = make_buffer(window_ms=0, timeout=0.05)
+    monkeypatch.setattr(db, "_get_registration_buffer", lambda: buffer)
+    with pytest.raises(db.RegistrationPending):
+        db.register_user_for_event(1, 1)
+    fake_db.gate.set()